@@ -1,7 +1,15 @@
 import pandas as pd
 import numpy as np
 import sqlite3
-from flask import Flask, request, jsonify
+import orjson
+import operator
+import threading
+import re
+import hashlib
+import os
+from functools import lru_cache
+from moods import MOOD_FILTERS
+from flask import Flask, Response, request, jsonify
 
 # --- 1. Initialize Your Application ---
 app = Flask(__name__)
@@ -10,48 +18,169 @@ app = Flask(__name__)
 # These are loaded *once* when the app starts
 try:
     # Load the processed data
-    df_scaled = pd.read_csv('api_data.csv', encoding='latin-1')
+    # Only these columns are used by the API, so skip the rest and keep the dtypes narrow
+    df_scaled = pd.read_csv(
+        'api_data.csv',
+        encoding='latin-1',
+        usecols=['title', 'name', 'artists', 'popularity'],
+        dtype={'title': 'string', 'name': 'string', 'artists': 'category', 'popularity': 'int16'}
+    )
     
-    # Load the similarity matrix
-    similarity_matrix = np.load('similarity_matrix.npy')
+    # Load the normalized float32 feature vectors built by fix_database.py
+    # (features @ features[i] is song i's cosine similarity to every song)
+    features = np.load('features.npy', mmap_mode='r')
+
+    # Load the precomputed neighbour table (row i = songs most similar to song i)
+    top_k = np.load('top50.npy', mmap_mode='r')
     
-    # Re-create the title-to-index mapping
-    indices = pd.Series(df_scaled.index, index=df_scaled['title']).drop_duplicates()
+    # Re-create the title-to-index mapping as a plain dict (much faster to look up than a Series)
+    TITLE_TO_IDX = dict(zip(df_scaled['title'].values, range(len(df_scaled))))
+
+    # Keep the titles as a plain NumPy array so recommendations can be gathered without pandas
+    TITLES_ARR = df_scaled['title'].to_numpy()
+
+    # The same mapping keyed by case-folded title, for requests typed in a different case
+    FOLDED_TITLE_TO_IDX = {}
+    for title, i in TITLE_TO_IDX.items():
+        FOLDED_TITLE_TO_IDX.setdefault(' '.join(title.split()).casefold(), i)
+
+    # Keep one SQLite connection open for full-text title searches (songs_fts in music.db)
+    # Flask serves requests on several threads, so access is guarded by db_lock
+    conn = sqlite3.connect('music.db', check_same_thread=False)
+    db_lock = threading.Lock()
+
+    # Load the unscaled 0.0-1.0 mood features from music.db once, as one array per column
+    # (Structure-of-Arrays), so mood filters are vectorized NumPy masks instead of SQL queries
+    db = sqlite3.connect('music.db')
+    mood_songs = pd.read_sql_query("""
+        SELECT name, artists, title, popularity,
+               danceability, energy, liveness, valence, tempo, speechiness
+        FROM songs
+        ORDER BY rowid
+    """, db)
+    db.close()
+
+    MOOD_FEATURES = {
+        column: mood_songs[column].to_numpy(np.float32)
+        for column in ['danceability', 'energy', 'liveness', 'valence', 'tempo', 'speechiness']
+    }
+    MOOD_POPULARITY = mood_songs['popularity'].to_numpy(np.int16)
+    MOOD_NAMES = mood_songs['name'].to_numpy()
+    MOOD_ARTISTS = mood_songs['artists'].to_numpy()
+    MOOD_TITLES = mood_songs['title'].to_numpy()
+
+    # Fingerprint the data files and the code that shapes /recommend responses;
+    # those responses only change when one of these does
+    # Uses each file's size and modification time rather than its bytes, so startup
+    # doesn't read the memory-mapped arrays in full and they stay lazily paged
+    dataset_hash = hashlib.md5()
+    for path in ('api_data.csv', 'features.npy', 'top50.npy', 'music.db', 'app.py', 'moods.py'):
+        stat = os.stat(path)
+        dataset_hash.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode('utf-8'))
+    DATASET_ETAG = dataset_hash.hexdigest()[:8]
     
     print("Model and data loaded successfully.")
     
 except FileNotFoundError:
-    print("ERROR: Model files not found. Please run the notebook to create them.")
+    print("ERROR: Model files not found. Please run the notebook and fix_database.py to create them.")
     exit()
 
-# --- 3. Copy Your Recommendation Function ---
-# This is the same function from your notebook
+# --- HTTP Caching Helpers ---
+# Responses are fixed for a given dataset, so clients can revalidate with
+# If-None-Match and get an empty 304 instead of downloading the JSON again
+def make_etag(*parts):
+    """
+    Builds an ETag from the dataset fingerprint and the request's parameters.
+    """
+    key = hashlib.md5('\0'.join(parts).encode('utf-8')).hexdigest()[:8]
+    return f"{DATASET_ETAG}-{key}"
+
+def body_etag(body):
+    """
+    Builds an ETag from a precomputed response body, so it changes whenever the body does.
+    """
+    return hashlib.md5(body).hexdigest()[:16]
+
+def is_not_modified(etag):
+    """
+    True if the client already holds the response tagged with this ETag.
+    """
+    return request.if_none_match.contains_weak(etag)
+
+def add_cache_headers(response, etag):
+    """
+    Tags a response with a weak ETag and lets clients cache it for an hour.
+    """
+    response.set_etag(etag, weak=True)
+    response.cache_control.public = True
+    response.cache_control.max_age = 3600
+    return response
+
+# --- Song Lookup ---
+# A full-text match is only trusted if it is the only song containing every word,
+# or if the request has at least this many words (so it is specific enough on its own)
+FTS_MIN_WORDS = 3
+
+def find_song_index(song_title):
+    """
+    Finds the row index of a song title, forgiving differences in case and punctuation.
+    """
+    # 1. Exact title
+    idx = TITLE_TO_IDX.get(song_title)
+    if idx is not None:
+        return idx
+
+    # 2. Same title in a different case or with extra spaces
+    idx = FOLDED_TITLE_TO_IDX.get(' '.join(song_title.split()).casefold())
+    if idx is not None:
+        return idx
+
+    # 3. Best full-text match containing every word of the title
+    #    Each word is quoted so punctuation can't break the FTS5 query syntax
+    words = re.findall(r'\w+', song_title)
+    if not words:
+        return None
+    match_query = ' '.join(f'"{word}"' for word in words)
+    with db_lock:
+        rows = conn.execute(
+            "SELECT title FROM songs_fts WHERE songs_fts MATCH ? ORDER BY rank LIMIT 2",
+            (match_query,)
+        ).fetchall()
+
+    # A short, ambiguous query (like "love") counts as not found rather than
+    # silently picking one of the songs that happen to contain it
+    if not rows or (len(rows) > 1 and len(words) < FTS_MIN_WORDS):
+        return None
+    return TITLE_TO_IDX.get(rows[0][0])
+
+# --- 3. Your Recommendation Function ---
+# Serves the precomputed neighbour table (top50.npy) built by fix_database.py,
+# scoring against features.npy only when more than 50 songs are asked for
 def get_recommendations(song_title, top_n=5):
     """
     Finds the top_n most similar songs for a given song title.
     """
-    try:
-        # 1. Get the index of the song
-        idx = indices[song_title]
-    except KeyError:
+    # 1. Get the index of the song
+    idx = find_song_index(song_title)
+    if idx is None:
         # Return an error string if song is not found
         return f"Error: Song '{song_title}' not found in the dataset."
 
-    # 2. Get the pairwise similarity scores
-    sim_scores = list(enumerate(similarity_matrix[idx]))
-
-    # 3. Sort the songs based on similarity
-    sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
-
-    # 4. Get the scores of the top_n most similar songs
-    sim_scores = sim_scores[1:top_n+1]
+    if top_n <= top_k.shape[1]:
+        # 2. Most requests are answered straight from the precomputed table
+        song_indices = top_k[idx, :top_n]
+    else:
+        # 3. Otherwise score every song against this one (a single BLAS matrix-vector product)
+        scores = features @ features[idx]
+        scores[idx] = -np.inf # A song is never its own recommendation
 
-    # 5. Get the song indices
-    song_indices = [i[0] for i in sim_scores]
+        # 4. Partition out the top_n best scores, then sort just those
+        top_n = min(top_n, len(scores) - 1)
+        part = np.argpartition(scores, -top_n)[-top_n:]
+        song_indices = part[np.argsort(-scores[part])]
 
-    # 6. Return the titles
-    # We use .iloc to get songs by their position index
-    return df_scaled['title'].iloc[song_indices]
+    # 5. Return the titles as a plain list
+    return TITLES_ARR[song_indices].tolist()
 
 # --- 4. Define Your API Endpoint ---
 @app.route('/recommend', methods=['GET'])
@@ -64,60 +193,109 @@ def recommend_songs():
     if not song_title:
         return jsonify({'error': 'A "song" query parameter is required.'}), 400
 
-    # 3. Get recommendations
-    recs = get_recommendations(song_title, top_n=5)
+    # 3. Skip the work if the client already has these recommendations
+    etag = make_etag('recommend', song_title)
+    if is_not_modified(etag):
+        return add_cache_headers(app.response_class(status=304), etag)
 
-    # 4. Handle results
-    if isinstance(recs, str):
-        # This means the function returned an error (song not found)
-        return jsonify({'error': recs}), 404
-    else:
-        # Convert the pandas Series to a simple list
-        rec_list = list(recs)
-        # Return the list as a JSON response
-        return jsonify({'recommendations': rec_list})
+    # 4. Get recommendations (cached per song)
+    payload, status = _recs_for(song_title)
+    if status != 200:
+        return jsonify(payload), status
+    return add_cache_headers(jsonify(payload), etag)
+
+# The data never changes while the app runs, so each song's answer can be cached
+@lru_cache(maxsize=4096)
+def _recs_for(song_title):
+    """
+    Builds the /recommend response body and status code for a song title.
+    """
+    idx = find_song_index(song_title)
+    if idx is None:
+        return {'error': f"Error: Song '{song_title}' not found in the dataset."}, 404
+
+    # The request may have matched a song with a different spelling, so the
+    # response says which song the recommendations are actually for
+    matched_title = TITLES_ARR[idx]
+    recs = get_recommendations(matched_title, top_n=5)
+    return {'song': matched_title, 'recommendations': recs}, 200
     
-    # --- 5. Define Your "Trending" Endpoint ---
+# --- 5. Define Your "Trending" Endpoint ---
+# The dataset never changes while the app runs, so the trending numbers are
+# worked out once here instead of scanning the DataFrame on every request
+
+# --- 1. Get Most Popular Song ---
+# Find the index (row) of the song with the maximum 'popularity' value
+POPULAR_IDX = df_scaled['popularity'].idxmax()
+
+# Get the full row of data for that song
+POPULAR_ROW = df_scaled.loc[POPULAR_IDX]
+
+# --- 2. Get Most Frequent Artist ---
+# .mode()[0] finds the most common value (the "mode") in the 'artists' column
+# (on a tie it picks the alphabetically first artist)
+TOP_ARTIST = df_scaled['artists'].mode()[0]
+
+# Count how many times that artist appears
+TOP_ARTIST_COUNT = int(df_scaled['artists'].value_counts().loc[TOP_ARTIST])
+
+TRENDING_PAYLOAD = {
+    'most_popular_song': {
+        'name': POPULAR_ROW['name'],
+        'artists': POPULAR_ROW['artists'],
+        'popularity': int(POPULAR_ROW['popularity']) # Convert to standard int
+    },
+    'most_frequent_artist_in_dataset': {
+        'artists': TOP_ARTIST,
+        'song_count_in_dataset': TOP_ARTIST_COUNT
+    }
+}
+TRENDING_BODY = orjson.dumps(TRENDING_PAYLOAD)
+TRENDING_ETAG = body_etag(TRENDING_BODY)
+
 @app.route('/trending', methods=['GET'])
 def get_trending():
-    try:
-        # --- 1. Get Most Popular Song ---
-        # Find the index (row) of the song with the maximum 'popularity' value
-        popular_song_idx = df_scaled['popularity'].idxmax()
-        
-        # Get the full row of data for that song
-        popular_song = df_scaled.loc[popular_song_idx]
-        
-        # Create a clean dictionary to return
-        most_popular_song_details = {
-            'name': popular_song['name'],
-            'artists': popular_song['artists'],
-            'popularity': int(popular_song['popularity']) # Convert to standard int
-        }
-
-        # --- 2. Get Most Frequent Artist ---
-        # .mode()[0] finds the most common value (the "mode") in the 'artists' column
-        most_frequent_artist_name = df_scaled['artists'].mode()[0]
-        
-        # Count how many times that artist appears
-        artist_song_count = int(df_scaled['artists'].value_counts().loc[most_frequent_artist_name])
-
-        most_frequent_artist_details = {
-            'artists': most_frequent_artist_name,
-            'song_count_in_dataset': artist_song_count
-        }
-
-        # --- 3. Return both as a JSON response ---
-        return jsonify({
-            'most_popular_song': most_popular_song_details,
-            'most_frequent_artist_in_dataset': most_frequent_artist_details
-        })
-
-    except Exception as e:
-        # Send a generic error if anything goes wrong
-        return jsonify({'error': str(e)}), 500
-    
-    # --- 7. UPDATED: Endpoint for Mood Recommendations ---
+    if is_not_modified(TRENDING_ETAG):
+        return add_cache_headers(app.response_class(status=304), TRENDING_ETAG)
+
+    response = Response(TRENDING_BODY, mimetype='application/json')
+    return add_cache_headers(response, TRENDING_ETAG)
+
+# --- 6. Define Your Mood Profiles ---
+# The profiles live in moods.py, which fix_database.py also uses to build its mood indexes
+
+# Turn each profile into a boolean mask over all songs once, up front
+MOOD_OPERATORS = {'>': operator.gt, '<': operator.lt}
+MOOD_MASKS = {}
+for mood_name, conditions in MOOD_FILTERS.items():
+    mask = np.ones(len(MOOD_POPULARITY), dtype=bool)
+    for column, op, value in conditions:
+        mask &= MOOD_OPERATORS[op](MOOD_FEATURES[column], value)
+    MOOD_MASKS[mood_name] = mask
+
+def _mood_payload(mood):
+    """
+    Builds the serialized /recommend_mood JSON body for a valid mood.
+    """
+    # Find 5 songs matching the mood, ordered by popularity
+    # (a stable sort keeps ties in database order, like the old SQL query)
+    matches = np.flatnonzero(MOOD_MASKS[mood])
+    top5 = matches[np.argsort(-MOOD_POPULARITY[matches], kind='stable')[:5]]
+
+    # orjson serializes these much faster than jsonify's standard-library json
+    recommendations = [
+        {'name': MOOD_NAMES[i], 'artists': MOOD_ARTISTS[i], 'title': MOOD_TITLES[i]}
+        for i in top5
+    ]
+
+    return orjson.dumps({'recommendations': recommendations})
+
+# There are only a few moods and the data never changes, so every mood's
+# response is built once here and each request just sends the stored bytes
+MOOD_CACHE = {mood: _mood_payload(mood) for mood in MOOD_MASKS}
+MOOD_ETAGS = {mood: body_etag(body) for mood, body in MOOD_CACHE.items()}
+
+# --- 7. UPDATED: Endpoint for Mood Recommendations ---
 @app.route('/recommend_mood', methods=['GET'])
 def recommend_mood():
     # Get the mood from the query parameter (e.g., /recommend_mood?mood=happy)
@@ -126,61 +304,20 @@ def recommend_mood():
     if not mood:
         return jsonify({'error': 'A "mood" query parameter is required.'}), 400
 
-    # Define our mood profiles using the unscaled 0.0-1.0 features
-    # These are SQL 'WHERE' clauses. You can tweak these values!
-    query_filter = ""
-    if mood == 'happy':
-        query_filter = "WHERE valence > 0.7 AND energy > 0.6 AND danceability > 0.5"
-    elif mood == 'sad':
-        query_filter = "WHERE valence < 0.3 AND energy < 0.4 AND tempo < 100"
-    elif mood == 'energetic':
-        query_filter = "WHERE energy > 0.8 AND tempo > 120"
-    elif mood == 'calm':
-        query_filter = "WHERE energy < 0.3 AND tempo < 100 AND valence > 0.4"
-    elif mood == 'romantic':
-        query_filter = "WHERE valence > 0.6 AND energy < 0.6 AND speechiness < 0.08"
-    elif mood == 'angry':
-        query_filter = "WHERE energy > 0.8 AND valence < 0.3 AND tempo > 110"
-    elif mood == 'nostalgic':
-        query_filter = "WHERE valence > 0.5 AND energy < 0.5 AND tempo < 110"
-    elif mood == 'focused':
-        query_filter = "WHERE speechiness < 0.05 AND energy < 0.3 AND liveness < 0.1"
-    elif mood == 'chill':
-        query_filter = "WHERE energy < 0.4 AND tempo < 110 AND liveness < 0.2"
-    elif mood == 'workout':
-        query_filter = "WHERE energy > 0.75 AND tempo > 120 AND danceability > 0.6"
-    elif mood == 'party':
-        query_filter = "WHERE energy > 0.7 AND danceability > 0.7 AND valence > 0.6"
-    else:
+    if mood not in MOOD_CACHE:
         return jsonify({'error': 'Invalid mood provided.'}), 400
 
-    try:
-        conn = sqlite3.connect('music.db')
-        conn.row_factory = sqlite3.Row # To get dict-like results
-        cursor = conn.cursor()
-        
-        # Find 5 songs matching the mood, ordered by popularity
-        query = f"""
-            SELECT name, artists, title
-            FROM songs
-            {query_filter}
-            ORDER BY popularity DESC
-            LIMIT 5
-        """
-        
-        cursor.execute(query)
-        songs_rows = cursor.fetchall()
-        conn.close()
-        
-        # Convert row objects to standard dicts
-        recommendations = [dict(row) for row in songs_rows]
-        
-        return jsonify({'recommendations': recommendations})
-
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    etag = MOOD_ETAGS[mood]
+    if is_not_modified(etag):
+        return add_cache_headers(app.response_class(status=304), etag)
+
+    response = Response(MOOD_CACHE[mood], mimetype='application/json')
+    return add_cache_headers(response, etag)
 
 # --- 5. Run the Application ---
+# This starts the single-process Flask dev server, which is only meant for development
+# In production run it with gunicorn instead (settings are in gunicorn.conf.py):
+#     gunicorn app:app
 if __name__ == '__main__':
     # debug=True will auto-reload the server when you save the file
     app.run(debug=True, port=5001)
\ No newline at end of file
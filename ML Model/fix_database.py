@@ -1,10 +1,18 @@
 import pandas as pd
+import numpy as np
 import sqlite3
 import os
+from moods import MOOD_FILTERS, mood_sql_filter
 
 DB_FILE = 'music.db'
+FEATURES_FILE = 'features.npy'
+TOP_K_FILE = 'top50.npy'
+TOP_K = 50 # How many neighbours to precompute for every song
 ORIGINAL_CSV = 'datasetmusic.csv' # <-- This is your original dataset
 
+# The audio features the recommender compares songs on (same as the notebook)
+numerical_features = ['danceability', 'energy', 'liveness', 'valence', 'tempo', 'speechiness']
+
 # 1. Delete the old database file if it exists
 if os.path.exists(DB_FILE):
     os.remove(DB_FILE)
@@ -37,12 +45,66 @@ print("Added 'play_count' and 'title' columns.")
 conn = sqlite3.connect(DB_FILE)
 print(f"Creating new database: {DB_FILE}...")
 
+# The file is rebuilt from scratch every run, so there is nothing to protect
+# with a journal or fsyncs while loading; skip both to speed up the build
+conn.execute("PRAGMA journal_mode=OFF")
+conn.execute("PRAGMA synchronous=OFF")
+conn.execute("PRAGMA temp_store=MEMORY")
+
 # 6. Save the preprocessed, UN-SCALED data to the 'songs' table
+#    method='multi' inserts many rows per INSERT statement instead of one at a time.
+#    Each row binds one variable per column, and older SQLite builds (before 3.32)
+#    allow at most 999 variables per statement, so the chunks are sized to fit
 try:
-    df_processed.to_sql('songs', conn, if_exists='replace', index=False, 
+    df_processed.to_sql('songs', conn, if_exists='replace', index=False,
+                        method='multi', chunksize=max(1, 999 // len(df_processed.columns)),
                         dtype={'title': 'TEXT PRIMARY KEY'})
     print(f"Success! Added {len(df_processed)} songs to the 'songs' table.")
 except Exception as e:
     print(f"Error: {e}")
 
-conn.close()
\ No newline at end of file
+# 6b. Give every mood profile its own partial index: it holds only the songs
+#     matching that mood, already sorted by popularity. A mood query written with
+#     the same conditions (like the ones in the notebook) reads its first 5 entries,
+#     with no filtering and no sort
+mood_indexes = "".join(
+    f"CREATE INDEX idx_mood_{mood} ON songs(popularity DESC) WHERE {mood_sql_filter(mood)};\n"
+    for mood in MOOD_FILTERS
+)
+conn.executescript(mood_indexes + "ANALYZE;")
+print(f"Created {len(MOOD_FILTERS)} mood indexes on the 'songs' table.")
+
+# 6c. Build a full-text index over the titles so the API can still find a
+#     song when the requested title isn't an exact match
+conn.executescript("""
+    CREATE VIRTUAL TABLE songs_fts USING fts5(title, content='songs', content_rowid='rowid');
+    INSERT INTO songs_fts(songs_fts) VALUES('rebuild');
+""")
+print("Created the 'songs_fts' full-text index on song titles.")
+
+conn.execute("PRAGMA optimize")
+conn.close()
+
+# 7. Build the song feature vectors (standard-scaled, like api_data.csv)
+features = df_processed[numerical_features]
+features = (features - features.mean()) / features.std(ddof=0)
+vecs = np.ascontiguousarray(features.to_numpy(dtype=np.float32))
+
+# L2-normalize so inner product == cosine similarity
+vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+
+# 8. Save the normalized vectors for the API (N x d float32, not an N x N matrix)
+#    A song's similarity row is just vecs @ vecs[i], one BLAS call away
+np.save(FEATURES_FILE, vecs)
+print(f"Saved {vecs.shape[1]}-d feature vectors for {len(vecs)} songs to '{FEATURES_FILE}'.")
+
+# 9. Precompute the TOP_K most similar songs for every song
+#    The data never changes between restarts, so the API can serve most
+#    requests with a single row lookup instead of scoring every song
+sim = vecs @ vecs.T # One BLAS sgemm over the float32 vectors
+np.fill_diagonal(sim, -np.inf) # A song is never its own recommendation
+top = np.argpartition(-sim, TOP_K, axis=1)[:, :TOP_K]
+top_scores = np.take_along_axis(sim, top, axis=1)
+top = np.take_along_axis(top, np.argsort(-top_scores, axis=1), axis=1)
+np.save(TOP_K_FILE, top.astype(np.int32))
+print(f"Saved the top {TOP_K} neighbours of every song to '{TOP_K_FILE}'.")
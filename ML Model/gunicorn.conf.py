@@ -0,0 +1,16 @@
+# Production server settings for the recommendation API
+# Run from this folder with:  gunicorn app:app
+# (gunicorn picks this file up automatically)
+
+# Same port the Flask dev server uses
+bind = '0.0.0.0:5001'
+
+# 4 worker processes with 2 threads each, so requests are served in parallel across cores
+workers = 4
+worker_class = 'gthread'
+threads = 2
+
+# Each worker loads the app itself (no preload_app), so nothing app.py opens at import
+# time (like a SQLite connection) is ever shared across a fork. The .npy files are
+# memory-mapped, so the workers still share those pages through the OS page cache.
+preload_app = False
@@ -0,0 +1,22 @@
+# Mood profiles shared by the API (app.py) and the database build (fix_database.py)
+# These use the unscaled 0.0-1.0 features from music.db
+# Each mood is a list of (column, operator, value) conditions. You can tweak these values!
+MOOD_FILTERS = {
+    'happy': [('valence', '>', 0.7), ('energy', '>', 0.6), ('danceability', '>', 0.5)],
+    'sad': [('valence', '<', 0.3), ('energy', '<', 0.4), ('tempo', '<', 100)],
+    'energetic': [('energy', '>', 0.8), ('tempo', '>', 120)],
+    'calm': [('energy', '<', 0.3), ('tempo', '<', 100), ('valence', '>', 0.4)],
+    'romantic': [('valence', '>', 0.6), ('energy', '<', 0.6), ('speechiness', '<', 0.08)],
+    'angry': [('energy', '>', 0.8), ('valence', '<', 0.3), ('tempo', '>', 110)],
+    'nostalgic': [('valence', '>', 0.5), ('energy', '<', 0.5), ('tempo', '<', 110)],
+    'focused': [('speechiness', '<', 0.05), ('energy', '<', 0.3), ('liveness', '<', 0.1)],
+    'chill': [('energy', '<', 0.4), ('tempo', '<', 110), ('liveness', '<', 0.2)],
+    'workout': [('energy', '>', 0.75), ('tempo', '>', 120), ('danceability', '>', 0.6)],
+    'party': [('energy', '>', 0.7), ('danceability', '>', 0.7), ('valence', '>', 0.6)],
+}
+
+def mood_sql_filter(mood):
+    """
+    Returns a mood's conditions as a literal SQL expression, e.g. "energy > 0.8 AND tempo > 120".
+    """
+    return " AND ".join(f"{column} {op} {value}" for column, op, value in MOOD_FILTERS[mood])